@@ -1 +1,43 @@
+from typing import Any, Dict, List
 
+from clickhouse_driver import Client
+
+MAX_SOURCE_RISK = 50.0
+MAX_SEARCH_NEEDLES = 255  # ClickHouse limit on the needle array of multiSearch* functions
+
+
+def score_ports(client: Client, ports: List[str], keywords: List[str], horizon_days: int) -> Dict[str, Dict[str, Any]]:
+    """Per-port disruption scores, aggregated entirely inside ClickHouse in one query.
+
+    Reads with FINAL so signals re-inserted by successive refreshes count once.
+    Each signal is attributed to the requested port whose name matches leftmost in its
+    port_name (GDELT locations are free text). Keywords only filter GDELT events, matched
+    against raw_data: the article URL, whose slug carries the headline words.
+    Ports without any signals are absent from the result.
+    """
+    if not ports:
+        return {}
+    gdelt_match = "source = 'GDELT'"
+    if keywords:
+        gdelt_match += " AND multiSearchAnyCaseInsensitive(raw_data, %(keywords)s)"
+    rows = client.execute(f"""
+        SELECT
+            multiSearchFirstIndexCaseInsensitive(port_name, %(ports)s) AS port_idx,
+            least(sumIf(impact_score, source = 'MarineTraffic'), %(cap)s) AS congestion_risk,
+            least(sumIf(impact_score, {gdelt_match}), %(cap)s) AS gdelt_risk,
+            countIf(source = 'MarineTraffic') AS vessels_waiting,
+            congestion_risk + gdelt_risk AS score
+        FROM port_disruption_signals FINAL
+        WHERE port_idx > 0
+          AND ingested_at > now() - INTERVAL %(horizon)s DAY
+        GROUP BY port_idx
+    """, {"ports": list(ports), "keywords": keywords, "cap": MAX_SOURCE_RISK, "horizon": horizon_days})
+    return {
+        ports[port_idx - 1]: {
+            "congestion_risk": float(congestion_risk),
+            "gdelt_risk": float(gdelt_risk),
+            "vessels_waiting": vessels_waiting,
+            "score": float(score),
+        }
+        for port_idx, congestion_risk, gdelt_risk, vessels_waiting, score in rows
+    }
@@ -1 +1,47 @@
+import asyncio
+import queue
+from typing import Any, Callable, TypeVar
 
+from clickhouse_driver import Client
+
+from app.config import settings
+
+# Idle connections, reused across requests so each query skips the TCP + auth handshake.
+# A Client is not thread-safe: it belongs to exactly one caller between get and release.
+_POOL: "queue.Queue[Client]" = queue.Queue()
+
+T = TypeVar("T")
+
+
+def get_client() -> Client:
+    try:
+        return _POOL.get_nowait()
+    except queue.Empty:
+        return Client(
+            host=settings.CLICKHOUSE_HOST,
+            port=settings.CLICKHOUSE_PORT,
+            user=settings.CLICKHOUSE_USER,
+            password=settings.CLICKHOUSE_PASSWORD,
+            database=settings.CLICKHOUSE_DB,
+            secure=settings.CLICKHOUSE_SECURE,
+            compression='lz4',
+        )
+
+
+def release_client(client: Client):
+    _POOL.put(client)
+
+
+async def run_query(fn: Callable[..., T], *args: Any) -> T:
+    """Run blocking fn(client, *args) on a worker thread with its own pooled client.
+
+    Lets independent queries proceed concurrently without sharing a Client.
+    """
+    def call() -> T:
+        client = get_client()
+        try:
+            return fn(client, *args)
+        finally:
+            release_client(client)
+
+    return await asyncio.to_thread(call)
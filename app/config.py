@@ -1 +1,18 @@
+import os
+from dotenv import load_dotenv
 
+load_dotenv()
+
+
+class Settings:
+    API_KEY = os.getenv("API_KEY", "")
+
+    CLICKHOUSE_HOST = os.getenv("CLICKHOUSE_HOST", "localhost")
+    CLICKHOUSE_PORT = int(os.getenv("CLICKHOUSE_PORT", "9000"))  # native protocol
+    CLICKHOUSE_USER = os.getenv("CLICKHOUSE_USER", "default")
+    CLICKHOUSE_PASSWORD = os.getenv("CLICKHOUSE_PASSWORD", "")
+    CLICKHOUSE_DB = os.getenv("CLICKHOUSE_DB", "disruption")
+    CLICKHOUSE_SECURE = os.getenv("CLICKHOUSE_SECURE", "false").lower() == "true"
+
+
+settings = Settings()
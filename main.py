@@ -1,17 +1,21 @@
-from fastapi import FastAPI, Depends, HTTPException, Header
-from pydantic import BaseModel
-from typing import List, Optional
+import asyncio
+import datetime
+import hashlib
+import time
+from fastapi import FastAPI, HTTPException, Header
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Optional, Tuple
 from app.config import settings
-from app.clickhouse_client import get_client
-from app.sources.marinetraffic import get_port_congestion
+from app.api.v1.forecast import MAX_SEARCH_NEEDLES, score_ports
+from app.clickhouse_client import run_query
 # import other sources...
 
 app = FastAPI(title="Port & Logistics Disruption Forecaster")
 
 class ForecastQuery(BaseModel):
-    ports: List[str]
+    ports: List[str] = Field(max_length=MAX_SEARCH_NEEDLES)
     horizon_days: int = 30
-    keywords: Optional[List[str]] = None
+    keywords: Optional[List[str]] = Field(None, max_length=MAX_SEARCH_NEEDLES)
 
 class ForecastSignal(BaseModel):
     source: str
@@ -29,6 +33,11 @@ class ForecastResult(BaseModel):
     contributing_signals: List[ForecastSignal]
     recommendations: List[str]
 
+# Signals refresh daily, so identical queries can share a result for a few minutes
+FORECAST_TTL_SECONDS = 600
+_forecast_cache: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+_forecast_cache_lock = asyncio.Lock()
+
 @app.post("/api/v1/port-disruption/forecast")
 async def forecast_disruption(
     query: ForecastQuery,
@@ -37,16 +46,21 @@ async def forecast_disruption(
     if x_api_key != settings.API_KEY:
         raise HTTPException(401, "Invalid API key")
 
+    cache_key = hashlib.blake2b(repr(query).encode(), digest_size=16).hexdigest()
+    async with _forecast_cache_lock:
+        cached = _forecast_cache.get(cache_key)
+    if cached and time.monotonic() - cached[0] < FORECAST_TTL_SECONDS:
+        return cached[1]
+
+    # Scores for every port come back from a single aggregate query
+    scores = await run_query(score_ports, query.ports, query.keywords or [], query.horizon_days)
+
     results = []
     for port in query.ports:
-        # Fetch signals (parallel in real version)
-        congestion = get_port_congestion(port)
-        gdelt_signals = get_gdelt_signals(port, query.keywords or [])
-        # acled_signals = ...
-        # news_signals = ...
+        port_scores = scores.get(port, {})
+        # acled / news signals: add as further sumIf() columns in score_ports
 
-        # Simple scoring (expand later)
-        score = congestion.get("risk", 0) + gdelt_signals.get("risk", 0)
+        score = port_scores.get("score", 0.0)
         level = "High" if score > 60 else "Medium" if score > 30 else "Low"
 
         results.append(ForecastResult(
@@ -57,10 +71,16 @@ async def forecast_disruption(
             predicted_delay_days=int(score / 5) if score > 20 else None,
             confidence=0.85,
             contributing_signals=[
-                ForecastSignal(source="MarineTraffic", type="Congestion", value=f"{congestion.get('vessels_waiting', 0)} vessels", impact=congestion.get("risk", 0))
+                ForecastSignal(source="MarineTraffic", type="Congestion", value=f"{port_scores.get('vessels_waiting', 0)} vessels", impact=port_scores.get("congestion_risk", 0.0))
                 # add others
             ],
             recommendations=["Reroute via alternative port", "Increase buffer stock"] if score > 50 else ["Monitor"]
         ))
 
-    return {"forecasts": results, "as_of": datetime.datetime.utcnow().isoformat() + "Z"}
+    response = {"forecasts": results, "as_of": datetime.datetime.utcnow().isoformat() + "Z"}
+    async with _forecast_cache_lock:
+        now = time.monotonic()
+        for key in [k for k, (ts, _) in _forecast_cache.items() if now - ts >= FORECAST_TTL_SECONDS]:
+            del _forecast_cache[key]
+        _forecast_cache[cache_key] = (now, response)
+    return response
@@ -0,0 +1,242 @@
+import asyncio
+import datetime
+import hashlib
+import io
+import zipfile
+
+import pyarrow as pa
+import pytest
+
+import daily_refresh
+
+
+def _gdelt_line(**values) -> bytes:
+    fields = [""] * len(daily_refresh.GDELT_RAW_NAMES)
+    for column, value in values.items():
+        fields[daily_refresh.GDELT_RAW_NAMES.index(column)] = value
+    return ("\t".join(fields) + "\n").encode()
+
+
+def _serve_gdelt_zip(monkeypatch, lines):
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as z:
+        z.writestr("20261014.export.CSV", b"".join(lines))
+
+    def fake_download(url, dest, timeout=30):
+        dest.write(archive.getvalue())
+        dest.flush()
+        dest.seek(0)
+        return None, None, "sha"
+
+    monkeypatch.setattr(daily_refresh, "download_if_changed", fake_download)
+
+
+def test_client_path_keeps_protest_rows_and_maps_them(monkeypatch):
+    protest = _gdelt_line(
+        GLOBALEVENTID="1001", SQLDATE="20261014", Actor1CountryCode="CHN",
+        EventCode="145", EventBaseCode="145", EventRootCode="14", GoldsteinScale="-6.5",
+        Actor1Geo_Fullname="Shanghai, Shanghai, China", SOURCEURL="https://example.com/dock-strike",
+    )
+    unscored = _gdelt_line(GLOBALEVENTID="1003", SQLDATE="20261014", EventCode="180", EventRootCode="18")
+    unrelated = _gdelt_line(GLOBALEVENTID="1002", SQLDATE="20261014", EventCode="036", EventRootCode="03")
+    cut_short = b"\t".join(protest.split(b"\t")[:40]) + b"\n"  # passes the root-code filter, 40 fields
+    _serve_gdelt_zip(monkeypatch, [protest, b"\n", b"truncated\tline\n", cut_short, unrelated, unscored])
+
+    _, cache_entry, batches = daily_refresh.fetch_gdelt_yesterday()
+    assert cache_entry == (None, None, "sha")
+    rows = pa.concat_tables([daily_refresh.map_gdelt_batch(b) for b in batches]).to_pylist()
+
+    assert rows == [{
+        "source": "GDELT",
+        "port_name": "Shanghai, Shanghai, China",
+        "country": "CHN",
+        "event_type": "14",
+        "description": "Event ID 1001, Goldstein -6.5",
+        "event_date": datetime.datetime(2026, 10, 14),
+        "impact_score": 32.5,
+        "raw_data": "https://example.com/dock-strike",
+    }, {
+        "source": "GDELT",
+        "port_name": "Unknown",
+        "country": "Unknown",
+        "event_type": "18",
+        "description": "Event ID 1003, Goldstein 0",
+        "event_date": datetime.datetime(2026, 10, 14),
+        "impact_score": 0.0,
+        "raw_data": "",
+    }]
+
+
+class _RecordingClient:
+    def __init__(self, engine_rows):
+        self.engine_rows = engine_rows
+        self.commands = []
+
+    def query(self, sql):
+        return type("Result", (), {"result_rows": self.engine_rows})()
+
+    def command(self, sql):
+        self.commands.append(" ".join(sql.split()))
+
+
+def test_create_table_migrates_plain_mergetree_table():
+    client = _RecordingClient([("MergeTree",)])
+    daily_refresh.create_table(client)
+
+    create, insert, exchange, drop = client.commands[1:]
+    assert "CREATE TABLE IF NOT EXISTS port_disruption_signals_migration" in create
+    assert "ReplacingMergeTree(ingested_at)" in create
+    assert insert.startswith("INSERT INTO port_disruption_signals_migration (source, port_name,")
+    assert insert.endswith("raw_data, ingested_at FROM port_disruption_signals")
+    assert exchange == "EXCHANGE TABLES port_disruption_signals AND port_disruption_signals_migration"
+    assert drop == "DROP TABLE port_disruption_signals_migration"
+
+
+def test_create_table_leaves_current_schema_alone():
+    for engine_rows in (
+        [],
+        [("ReplacingMergeTree",)],
+        [("SharedReplacingMergeTree",)],
+        [("ReplicatedReplacingMergeTree",)],
+    ):
+        client = _RecordingClient(engine_rows)
+        daily_refresh.create_table(client)
+        assert len(client.commands) == 1
+        assert client.commands[0].startswith("CREATE TABLE IF NOT EXISTS port_disruption_signals (")
+
+
+@pytest.fixture
+def feed_cache(monkeypatch, tmp_path):
+    monkeypatch.setattr(daily_refresh, "FEED_CACHE_PATH", str(tmp_path / "feed_cache.sqlite3"))
+
+
+class _FakeResponse:
+    def __init__(self, status, body=b"", headers=None):
+        self.status_code = self.status = status
+        self.body = body
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        yield self.body
+
+    async def read(self):
+        return self.body
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+
+def _fake_get(monkeypatch, response):
+    """Patch requests.get to answer with response, returning the headers of each call."""
+    sent = []
+
+    def get(url, headers, **kwargs):
+        sent.append(headers)
+        return response
+
+    monkeypatch.setattr(daily_refresh.requests, "get", get)
+    return sent
+
+
+URL = "http://example.com/feed"
+STORED = ('"v1"', "Tue, 13 Oct 2026 00:00:00 GMT", hashlib.sha256(b"body").hexdigest())
+
+
+def test_download_sends_conditional_headers_and_skips_304(monkeypatch, feed_cache):
+    daily_refresh.cache_store(URL, STORED)
+    sent = _fake_get(monkeypatch, _FakeResponse(304))
+
+    assert daily_refresh.download_if_changed(URL, io.BytesIO()) is None
+    assert sent == [{"If-None-Match": '"v1"', "If-Modified-Since": "Tue, 13 Oct 2026 00:00:00 GMT"}]
+
+
+def test_download_skips_body_with_stored_sha(monkeypatch, feed_cache):
+    daily_refresh.cache_store(URL, STORED)
+    _fake_get(monkeypatch, _FakeResponse(200, b"body", {"ETag": '"v2"'}))
+
+    assert daily_refresh.download_if_changed(URL, io.BytesIO()) is None
+
+
+def test_download_returns_new_entry_without_storing_it(monkeypatch, feed_cache):
+    sent = _fake_get(monkeypatch, _FakeResponse(200, b"new body", {"ETag": '"v2"'}))
+    dest = io.BytesIO()
+
+    entry = daily_refresh.download_if_changed(URL, dest)
+    assert entry == ('"v2"', None, hashlib.sha256(b"new body").hexdigest())
+    assert dest.read() == b"new body"
+    assert sent == [{}]
+    assert daily_refresh.cache_lookup(URL) is None  # stored by the caller after the insert
+
+
+class _FakeSession:
+    def __init__(self, response):
+        self.response = response
+        self.sent = []
+
+    def get(self, url, headers, **kwargs):
+        self.sent.append(headers)
+        return self.response
+
+
+def test_fetch_feed_sends_conditional_headers_and_skips_304():
+    session = _FakeSession(_FakeResponse(304))
+
+    assert asyncio.run(daily_refresh.fetch_feed(session, URL, STORED)) == (URL, None, None)
+    assert session.sent == [{"If-None-Match": '"v1"', "If-Modified-Since": "Tue, 13 Oct 2026 00:00:00 GMT"}]
+
+
+def test_fetch_feed_skips_body_with_stored_sha():
+    session = _FakeSession(_FakeResponse(200, b"body"))
+
+    assert asyncio.run(daily_refresh.fetch_feed(session, URL, STORED)) == (URL, None, None)
+
+
+def _refresh_sources(monkeypatch, insert):
+    """Wire daily_refresh to one GDELT batch and one feed signal, inserted with insert."""
+    batch = pa.RecordBatch.from_pylist(
+        [{"id": 1, "sqldate": datetime.datetime(2026, 10, 14), "country": "CHN", "event_root": "14",
+          "goldstein": -6.5, "location": "Shanghai", "event_base": "145", "source_url": ""}],
+        schema=pa.schema([(name, arrow_type) for _, name, arrow_type in daily_refresh.GDELT_FIELDS]),
+    )
+    signal = {
+        "source": "MarineTraffic", "port_name": "Shanghai", "country": "Unknown", "event_type": "Congestion",
+        "description": "Congestion", "event_date": datetime.datetime(2026, 10, 14), "impact_score": 25.0,
+        "raw_data": "",
+    }
+    monkeypatch.setattr(daily_refresh, "GDELT_INGEST_MODE", "client")
+    monkeypatch.setattr(daily_refresh, "get_client", lambda: None)
+    monkeypatch.setattr(daily_refresh, "release_client", lambda client: None)
+    monkeypatch.setattr(daily_refresh, "create_table", lambda client: None)
+    monkeypatch.setattr(daily_refresh, "fetch_gdelt_yesterday", lambda: ("gdelt-url", STORED, iter([batch])))
+    monkeypatch.setattr(daily_refresh, "parse_marinetraffic_rss", lambda: ([signal], [(URL, STORED)]))
+    monkeypatch.setattr(daily_refresh, "insert_signals", insert)
+
+
+def test_refresh_stores_cache_entries_only_after_insert(monkeypatch, feed_cache):
+    def failing_insert(table):
+        raise RuntimeError("ClickHouse unavailable")
+
+    _refresh_sources(monkeypatch, failing_insert)
+    with pytest.raises(RuntimeError):
+        daily_refresh.daily_refresh()
+    assert daily_refresh.cache_lookup("gdelt-url") is None
+    assert daily_refresh.cache_lookup(URL) is None
+
+    inserted = []
+    _refresh_sources(monkeypatch, lambda table: inserted.append(table.num_rows) or table.num_rows)
+    daily_refresh.daily_refresh()
+    assert inserted == [2]
+    assert daily_refresh.cache_lookup("gdelt-url") == STORED
+    assert daily_refresh.cache_lookup(URL) == STORED
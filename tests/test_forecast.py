@@ -0,0 +1,50 @@
+from app.api.v1.forecast import MAX_SOURCE_RISK, score_ports
+
+
+class _RecordingClient:
+    def __init__(self, rows):
+        self.rows = rows
+        self.calls = []
+
+    def execute(self, sql, params):
+        self.calls.append((" ".join(sql.split()), params))
+        return self.rows
+
+
+def test_score_ports_maps_port_index_back_to_port():
+    # port_idx is 1-based into the ports list; Rotterdam has no signals and no row
+    client = _RecordingClient([(3, 25.0, 12.5, 1, 37.5), (1, 0.0, 50.0, 0, 50.0)])
+    scores = score_ports(client, ["Shanghai", "Rotterdam", "Los Angeles"], ["strike"], 30)
+
+    assert scores == {
+        "Los Angeles": {"congestion_risk": 25.0, "gdelt_risk": 12.5, "vessels_waiting": 1, "score": 37.5},
+        "Shanghai": {"congestion_risk": 0.0, "gdelt_risk": 50.0, "vessels_waiting": 0, "score": 50.0},
+    }
+    assert "Rotterdam" not in scores
+
+
+def test_score_ports_query_and_params():
+    client = _RecordingClient([])
+    score_ports(client, ("Shanghai",), ["strike", "blockade"], 7)
+
+    (sql, params), = client.calls
+    assert "FROM port_disruption_signals FINAL" in sql
+    assert "multiSearchFirstIndexCaseInsensitive(port_name, %(ports)s) AS port_idx" in sql
+    assert "sumIf(impact_score, source = 'GDELT' AND multiSearchAnyCaseInsensitive(raw_data, %(keywords)s))" in sql
+    assert "GROUP BY port_idx" in sql
+    assert params == {"ports": ["Shanghai"], "keywords": ["strike", "blockade"], "cap": MAX_SOURCE_RISK, "horizon": 7}
+
+
+def test_score_ports_without_keywords_counts_every_gdelt_signal():
+    client = _RecordingClient([])
+    score_ports(client, ["Shanghai"], [], 30)
+
+    (sql, _), = client.calls
+    assert "multiSearchAny" not in sql
+    assert "sumIf(impact_score, source = 'GDELT')" in sql
+
+
+def test_score_ports_without_ports_skips_the_query():
+    client = _RecordingClient([])
+    assert score_ports(client, [], ["strike"], 30) == {}
+    assert client.calls == []
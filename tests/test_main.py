@@ -0,0 +1,60 @@
+import asyncio
+import types
+
+import pytest
+from fastapi import HTTPException
+
+import main
+
+
+@pytest.fixture
+def api(monkeypatch):
+    """Endpoint with a fake clock and a run_query that counts its calls."""
+    clock = types.SimpleNamespace(now=1000.0)
+    calls = []
+
+    async def fake_run_query(fn, ports, keywords, horizon_days):
+        calls.append(ports)
+        return {port: {"score": 40.0, "congestion_risk": 25.0, "vessels_waiting": 1} for port in ports}
+
+    monkeypatch.setattr(main, "run_query", fake_run_query)
+    monkeypatch.setattr(main, "time", types.SimpleNamespace(monotonic=lambda: clock.now))
+    monkeypatch.setattr(main, "_forecast_cache", {})
+    monkeypatch.setattr(main.settings, "API_KEY", "key")
+
+    def forecast(ports, api_key="key"):
+        return asyncio.run(main.forecast_disruption(main.ForecastQuery(ports=ports), x_api_key=api_key))
+
+    return types.SimpleNamespace(clock=clock, calls=calls, forecast=forecast)
+
+
+def test_forecast_is_served_from_cache_within_ttl(api):
+    first = api.forecast(["Shanghai"])
+    api.clock.now += main.FORECAST_TTL_SECONDS - 1
+    assert api.forecast(["Shanghai"]) is first
+    assert api.calls == [["Shanghai"]]
+
+
+def test_forecast_is_recomputed_after_ttl(api):
+    first = api.forecast(["Shanghai"])
+    api.clock.now += main.FORECAST_TTL_SECONDS
+    assert api.forecast(["Shanghai"]) is not first
+    assert api.calls == [["Shanghai"], ["Shanghai"]]
+
+
+def test_expired_entries_are_pruned_on_write(api):
+    api.forecast(["Shanghai"])
+    api.clock.now += main.FORECAST_TTL_SECONDS
+    api.forecast(["Rotterdam"])
+    assert len(main._forecast_cache) == 1
+    (written_at, response), = main._forecast_cache.values()
+    assert written_at == api.clock.now
+    assert response["forecasts"][0].port == "Rotterdam"
+
+
+def test_api_key_is_checked_before_cache_hit(api):
+    api.forecast(["Shanghai"])
+    with pytest.raises(HTTPException) as exc:
+        api.forecast(["Shanghai"], api_key="wrong")
+    assert exc.value.status_code == 401
+    assert api.calls == [["Shanghai"]]